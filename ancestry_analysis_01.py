@@ -10,7 +10,7 @@ As a bioinformatician and anthropologist, I've developed a pure Python script to
 
 This code estimates an individual's ancestry proportions based on their genotype data and a reference panel of ethnic allele frequencies. It's important to understand that this is a simplified model. Professional tools use complex statistical algorithms and vast, proprietary datasets. This script, however, serves as a great educational tool to understand the core principles.
 
-Due to the **no external libraries** constraint, the script manually parses input files and uses text-based characters with ANSI color codes to generate a stacked bar chart directly in your terminal. It relies only on Python's standard library, particularly the `math` module for calculations.
+The script manually parses input files and uses text-based characters with ANSI color codes to generate a stacked bar chart directly in your terminal. The likelihood calculations are vectorized with NumPy: the reference panel is held as a single (population x variant) frequency matrix so each population's log-likelihood is computed in one C-level pass instead of a Python loop per variant.
 
 ### The Scientific Approach
 
@@ -29,9 +29,31 @@ The script operates on a fundamental principle of population genetics: different
 Here is the complete, self-contained Python script. You can run it as-is to see an example, then replace the contents of `sample_vcf_data` and `reference_tsv_data` with your actual file data.
 """
 
+import hashlib
+import io
 import math
+import mmap
+import os
+import re
 import sys
 
+# numpy is strongly recommended but, true to this script's stdlib-only
+# origins, optional: without it the pipeline falls back to pure-Python
+# paths that at least precompute all logs once per reference panel.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# numba is optional: when available, the likelihood loop runs as JIT-compiled
+# native code parallelized over populations; otherwise we fall back to NumPy.
+try:
+    from ancestry_numba import _admix_ll, _admix_ll_batch, _scan_vcf
+except ImportError:
+    _admix_ll = None
+    _admix_ll_batch = None
+    _scan_vcf = None
+
 # --- CONFIGURATION & DATA MAPPING ---
 
 # A mapping from 79 illustrative ethnicities in the reference file to 10 major population groups.
@@ -95,127 +117,468 @@ rs5	0.40	0.42	0.80	0.77	0.10	0.12
 
 # --- CORE LOGIC ---
 
+# Diploid GT strings to alternate-allele counts; one dict lookup replaces a
+# chain of up to seven string comparisons per line.
+_GT_MAP = {'0/0': 0, '0|0': 0,
+           '0/1': 1, '1/0': 1, '0|1': 1, '1|0': 1,
+           '1/1': 2, '1|1': 2}
+
+
 def parse_vcf(vcf_content):
     """
     Parses VCF data to extract sample genotypes.
     Genotypes are coded as: 0 (homozygous reference), 1 (heterozygous), 2 (homozygous alternate).
     """
     sample_genotypes = {}
-    lines = vcf_content.strip().split('\\n')
-    for line in lines:
+    for line in vcf_content.splitlines():
         if line.startswith('#'):
             continue
-        fields = line.split('\\t')
-        variant_id = fields[2]
-        genotype_str = fields[9].split(':')[0]
-
-        if genotype_str == '0/0' or genotype_str == '0|0':
-            sample_genotypes[variant_id] = 0
-        elif genotype_str == '0/1' or genotype_str == '0|1' or genotype_str == '1|0':
-            sample_genotypes[variant_id] = 1
-        elif genotype_str == '1/1' or genotype_str == '1|1':
-            sample_genotypes[variant_id] = 2
+        fields = line.split('\t')
+        genotype = _GT_MAP.get(fields[9].split(':')[0])
+        if genotype is not None:
+            sample_genotypes[fields[2]] = genotype
     return sample_genotypes
 
 
-def parse_reference(tsv_content):
+# A data line up to its GT field follows a strict grammar, so one compiled
+# regex scanning the whole buffer replaces per-line splits: capture the ID
+# (field 3) and the two GT alleles (field 10), skipping header lines. The
+# trailing lookahead demands a field boundary after the GT triple so
+# multi-digit allele indices like 0/11 are skipped, as in parse_vcf.
+_VCF_LINE_RE = re.compile(
+    rb'^(?!#)(?:[^\t\n]*\t){2}([^\t\n]+)(?:\t[^\t\n]*){6}\t([01])[/|]([01])'
+    rb'(?=[:\t\n]|$)',
+    re.MULTILINE)
+
+
+def parse_vcf_bytes(vcf_bytes):
     """
-    Parses the reference TSV file of allele frequencies.
-    Returns a dictionary: {variant_id: {ethnicity: frequency}}
+    Parses VCF data held as raw bytes (e.g. a whole file read or mapped as binary).
+
+    With numba available, a JIT-compiled scanner walks the byte buffer once and
+    writes genotype codes and ID offsets into preallocated arrays -- no per-line
+    Python string objects for multi-gigabyte VCFs. Only the matched variant IDs
+    are decoded afterwards. Without numba, a single finditer over the buffer
+    with _VCF_LINE_RE runs the whole tokenization as one C-level state machine
+    instead of millions of per-field Python splits.
     """
-    reference_freqs = {}
-    lines = tsv_content.strip().split('\\n')
-    header = lines[0].split('\\t')
-    ethnicities = header[1:]
+    if _scan_vcf is None:
+        return {match.group(1).decode():
+                (match.group(2)[0] - 48) + (match.group(3)[0] - 48)
+                for match in _VCF_LINE_RE.finditer(vcf_bytes)}
 
-    for line in lines[1:]:
-        fields = line.split('\\t')
-        variant_id = fields[0]
-        reference_freqs[variant_id] = {}
-        for i, freq_str in enumerate(fields[1:]):
-            ethnicity = ethnicities[i]
-            # Handle potential conversion errors or empty strings
-            try:
-                reference_freqs[variant_id][ethnicity] = float(freq_str)
-            except ValueError:
-                reference_freqs[variant_id][ethnicity] = 0.0 # Assign a neutral frequency
+    buf = np.frombuffer(vcf_bytes, dtype=np.uint8)
+    max_rows = int(np.count_nonzero(buf == 10)) + 1
+    id_starts = np.empty(max_rows, dtype=np.int64)
+    id_ends = np.empty(max_rows, dtype=np.int64)
+    genotypes = np.empty(max_rows, dtype=np.int8)
+    n_rows = _scan_vcf(buf, id_starts, id_ends, genotypes)
+
+    return {bytes(vcf_bytes[id_starts[r]:id_ends[r]]).decode(): int(genotypes[r])
+            for r in range(n_rows)}
+
+
+def parse_vcf_file(path):
+    """
+    Parses a VCF straight from disk through a read-only memory map.
+
+    Multi-gigabyte VCFs never materialize as a Python string: pages fault in
+    on demand as the byte scanner (or regex) advances, so peak memory stays
+    near zero instead of ~2x the file size for read()-then-split, and I/O
+    overlaps the parsing.
+    """
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return parse_vcf_bytes(mapped)
 
-    return reference_freqs
 
+def load_reference_panel_file(path, pop_map, cache_dir='.cache'):
+    """
+    load_reference_panel for an on-disk TSV, via a read-only memory map.
 
-def aggregate_frequencies(reference_freqs, pop_map):
+    The cache key is hashed directly over the mapped bytes, so a warm run
+    touches the file only to fingerprint it and never decodes it.
+    """
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return load_reference_panel(mapped, pop_map, cache_dir)
+
+
+# What float() would accept in a frequency cell, for the rare cleanup pass
+_FLOAT_RE = re.compile(r'\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\s*\Z')
+
+
+def parse_reference(tsv_content):
+    """
+    Parses the reference TSV file of allele frequencies.
+
+    Returns (variant_ids, ethnicities, raw_freqs) where raw_freqs is a
+    (variant x ethnicity) float32 array -- fp32 is plenty for allele
+    frequencies and halves the memory and bandwidth of the reference store.
+    A single np.loadtxt call does the tokenizing and float conversion in C
+    instead of a Python loop per cell.
+    """
+    header, _, body = tsv_content.strip().partition('\n')
+    ethnicities = header.split('\t')[1:]
+
+    if not body:
+        return [], ethnicities, np.empty((0, len(ethnicities)), dtype=np.float32)
+
+    # comments=None: '#' is legitimate inside variant IDs, and loadtxt's
+    # default comment handling would truncate or drop such rows
+    arr = np.loadtxt(io.StringIO(body), delimiter='\t', dtype=str,
+                     comments=None, ndmin=2)
+    variant_ids = arr[:, 0].tolist()
+    # Empty cells get the same neutral 0.0 frequency the old float() fallback assigned
+    cells = np.where(arr[:, 1:] == '', '0', arr[:, 1:])
+    try:
+        raw_freqs = cells.astype(np.float32)
+    except ValueError:
+        # Other unparseable cells (e.g. 'NA') also get the neutral 0.0, like
+        # the old per-cell float() fallback; only panels that actually contain
+        # them pay for the per-cell validity check
+        numeric = np.array([[bool(_FLOAT_RE.match(cell)) for cell in row]
+                            for row in cells])
+        raw_freqs = np.where(numeric, cells, '0').astype(np.float32)
+
+    return variant_ids, ethnicities, raw_freqs
+
+
+def aggregate_frequencies(ethnicities, raw_freqs, pop_map):
     """
     Aggregates frequencies from fine-grained ethnicities into major population groups.
+
+    Takes the (variant x ethnicity) matrix from parse_reference and returns
+    (major_populations, freq_matrix) where freq_matrix is a (population x
+    variant) float32 array of averaged allele frequencies. Populations with no
+    mapped ethnicities in the reference file get NaN entries.
     """
-    major_pop_freqs = {}
-    major_populations = sorted(list(set(pop_map.values())))
+    major_populations = sorted(set(pop_map.values()))
+    pop_to_idx = {pop: i for i, pop in enumerate(major_populations)}
+
+    # Resolve ethnicity -> major population once into an integer LUT in the
+    # reference column order; -1 marks unmapped ethnicities. This replaces a
+    # dict hash per (variant, ethnicity) pair with a contiguous-array gather.
+    eth_to_major = np.fromiter(
+        (pop_to_idx[pop_map[e]] if e in pop_map else -1 for e in ethnicities),
+        dtype=np.int32, count=len(ethnicities))
+    mapped = eth_to_major >= 0
 
-    # Initialize structure
-    for pop in major_populations:
-        major_pop_freqs[pop] = {}
+    # Averaging into major groups is a linear operator: membership[p, e] is
+    # 1/|group p| if ethnicity e belongs to p, so the whole aggregation is one
+    # BLAS matmul over the reference instead of any per-variant Python work.
+    membership = np.zeros((len(major_populations), len(ethnicities)), dtype=np.float32)
+    membership[eth_to_major[mapped], np.flatnonzero(mapped)] = 1.0
+    # Rows with no members become all-NaN (0/0), which downstream code skips
+    # just like the old `None` entries.
+    with np.errstate(invalid='ignore'):
+        membership /= membership.sum(axis=1, keepdims=True)
 
-    variants = list(reference_freqs.keys())
-    for variant in variants:
-        # Temporary storage for averaging
-        pop_sums = {pop: 0.0 for pop in major_populations}
-        pop_counts = {pop: 0 for pop in major_populations}
+    freq_matrix = membership @ raw_freqs.T
 
-        for ethnicity, freq in reference_freqs[variant].items():
-            if ethnicity in pop_map:
-                major_pop = pop_map[ethnicity]
-                pop_sums[major_pop] += freq
-                pop_counts[major_pop] += 1
+    return major_populations, freq_matrix
 
-        # Calculate average frequency for each major population
-        for pop in major_populations:
-            if pop_counts[pop] > 0:
-                major_pop_freqs[pop][variant] = pop_sums[pop] / pop_counts[pop]
-            else:
-                # If no ethnicities in the ref file map to this major pop, we can't calculate
-                major_pop_freqs[pop][variant] = None
 
-    return major_pop_freqs
+def build_hwe_log_table(freq_matrix, epsilon=1e-9):
+    """
+    Precomputes Hardy-Weinberg log-probabilities for every genotype once.
 
+    Returns a (3 x population x variant) array where entry [g, p, v] is the
+    log-probability of genotype g at variant v under population p's allele
+    frequency. Building this table once means scoring a sample needs no pow
+    or log calls at all -- just gathers and additions -- which pays off when
+    the same reference panel scores many samples.
 
-def calculate_admixture(sample_genotypes, major_pop_freqs):
+    The clip happens after upcasting to float64: 1 - epsilon rounds to exactly
+    1.0 in float32, which would let a frequency of 1.0 through and put -inf in
+    the genotype-0/1 entries.
     """
-    Calculates admixture proportions using a log-likelihood approach.
+    p = np.clip(freq_matrix.astype(np.float64), epsilon, 1 - epsilon)
+    log_p = np.log(p)
+    log_1mp = np.log1p(-p)
+
+    # Genotype 0 -> (1-p)^2, 1 -> 2p(1-p), 2 -> p^2, all in log space
+    return np.stack([2 * log_1mp,
+                     math.log(2) + log_p + log_1mp,
+                     2 * log_p], axis=0)
+
+
+def _dequantize_freqs(freq_q, valid):
     """
-    log_likelihoods = {}
-    epsilon = 1e-9  # A small number to avoid log(0)
+    Expands a uint8-quantized frequency matrix back to float32, restoring NaN
+    where the panel has no data. Happens once per reference load, so the
+    per-sample hot paths never touch the narrow representation.
+
+    Values are clamped half a quantization step away from 0 and 1: codes 0 and
+    255 would otherwise snap frequencies like 0.999 to exactly 1.0, turning a
+    log-probability of ~-13.8 into the epsilon floor's ~-41 (or -inf) and
+    blowing the rounding error up unboundedly in log space.
+    """
+    freq_matrix = np.clip(freq_q.astype(np.float64) / 255.0,
+                          1.0 / 510.0, 1.0 - 1.0 / 510.0).astype(np.float32)
+    freq_matrix[~valid] = np.nan
+    return freq_matrix
 
-    for pop, freqs in major_pop_freqs.items():
-        total_log_likelihood = 0.0
-        # Iterate over variants present in the sample
-        for variant, genotype in sample_genotypes.items():
-            if variant not in freqs or freqs[variant] is None:
-                continue # Skip variants not in the reference panel
 
-            p = freqs[variant]
-            p = max(epsilon, min(1 - epsilon, p)) # Clamp frequency to avoid math errors
+def _load_reference_panel_py(tsv_content, pop_map):
+    """
+    Stdlib-only panel builder used when numpy is unavailable.
+
+    Produces the same (major_populations, variant_ids, freq_matrix, log_table)
+    shape as load_reference_panel, except freq_matrix is None and log_table is
+    a nested list: log_table[pop][variant] is a (log P(g=0), log P(g=1),
+    log P(g=2)) tuple, or None where the panel has no data. All math.log calls
+    happen here, once per reference, so the interpreted scoring loop is pure
+    additions.
+    """
+    epsilon = 1e-9
+    log2 = math.log(2)
 
-            # Hardy-Weinberg Equilibrium probabilities
-            if genotype == 0:  # Homozygous reference (e.g., A/A)
-                prob = (1 - p)**2
-            elif genotype == 1:  # Heterozygous (e.g., A/G)
-                prob = 2 * p * (1 - p)
-            else:  # Homozygous alternate (e.g., G/G)
-                prob = p**2
+    lines = tsv_content.strip().splitlines()
+    ethnicities = lines[0].split('\t')[1:]
+    major_populations = sorted(set(pop_map.values()))
+    pop_to_idx = {pop: i for i, pop in enumerate(major_populations)}
+    eth_to_major = [pop_to_idx.get(pop_map.get(e)) for e in ethnicities]
 
-            total_log_likelihood += math.log(max(prob, epsilon))
+    variant_ids = []
+    log_table = [[] for _ in major_populations]
+    for line in lines[1:]:
+        fields = line.split('\t')
+        variant_ids.append(fields[0])
+
+        pop_sums = [0.0] * len(major_populations)
+        pop_counts = [0] * len(major_populations)
+        for p_idx, freq_str in zip(eth_to_major, fields[1:]):
+            if p_idx is None:
+                continue
+            try:
+                pop_sums[p_idx] += float(freq_str)
+            except ValueError:
+                pass  # same neutral 0.0 the numpy parser assigns
+            pop_counts[p_idx] += 1
 
-        log_likelihoods[pop] = total_log_likelihood
+        for p_idx, count in enumerate(pop_counts):
+            if count == 0:
+                log_table[p_idx].append(None)
+                continue
+            p = max(epsilon, min(1 - epsilon, pop_sums[p_idx] / count))
+            log_p = math.log(p)
+            log_1mp = math.log1p(-p)
+            log_table[p_idx].append((2 * log_1mp, log2 + log_p + log_1mp, 2 * log_p))
 
-    # Normalize log-likelihoods to get proportions
-    # Subtracting the max log-likelihood before exponentiating is a standard numerical stability trick
-    max_log_like = max(log_likelihoods.values())
-    likelihoods = {pop: math.exp(ll - max_log_like) for pop, ll in log_likelihoods.items()}
+    return major_populations, variant_ids, None, log_table
 
-    total_likelihood = sum(likelihoods.values())
-    if total_likelihood == 0:
-        return {pop: 0.0 for pop in major_pop_freqs}
 
-    proportions = {pop: (like / total_likelihood) for pop, like in likelihoods.items()}
+def load_reference_panel(tsv_content, pop_map, cache_dir='.cache'):
+    """
+    Parses and aggregates the reference panel, with an on-disk cache.
+
+    The aggregated frequency matrix and HWE log table are identical across
+    sample runs, so they are stored in an .npz keyed by a SHA-1 of the TSV
+    content and population mapping; warm runs np.load them in milliseconds
+    instead of re-parsing and re-aggregating.
+
+    The stored panel is quantized to uint8 (frequency x 255): allele
+    frequencies carry ~2 decimals of signal, so the 1/255 rounding error is
+    negligible against the HWE model error while quartering the matrix's
+    footprint. Dequantization clamps half a step away from 0 and 1 (see
+    _dequantize_freqs) so the error stays bounded in log space too. The log
+    table is always built from the dequantized values, so cold and warm runs
+    score identically.
+
+    Returns (major_populations, variant_ids, freq_matrix, log_table).
+    """
+    # Accept str or any bytes-like buffer (e.g. an mmap from
+    # load_reference_panel_file); only decode when actually parsing
+    if isinstance(tsv_content, str):
+        raw = tsv_content.encode()
+    else:
+        raw = tsv_content
+        tsv_content = None
+
+    if np is None:
+        if tsv_content is None:
+            tsv_content = bytes(raw).decode()
+        return _load_reference_panel_py(tsv_content, pop_map)
+
+    digest = hashlib.sha1(raw)
+    digest.update(repr(sorted(pop_map.items())).encode())
+    key = digest.hexdigest()
+    cache_path = os.path.join(cache_dir, f'ref_{key}.npz')
+
+    if os.path.exists(cache_path):
+        cached = np.load(cache_path, allow_pickle=False)
+        freq_matrix = _dequantize_freqs(cached['freq_q'], cached['valid'])
+        return (cached['pops'].tolist(), cached['variant_ids'].tolist(),
+                freq_matrix, cached['log_table'])
+
+    if tsv_content is None:
+        tsv_content = bytes(raw).decode()
+    variant_ids, ethnicities, raw_freqs = parse_reference(tsv_content)
+    major_populations, freq_exact = aggregate_frequencies(
+        ethnicities, raw_freqs, pop_map)
+
+    valid = np.isfinite(freq_exact)
+    # Clip before the cast: uint8 wraps rather than saturates, so an
+    # out-of-range cell like 1.5 would otherwise silently land on ~0.49
+    freq_q = np.round(np.clip(np.nan_to_num(freq_exact), 0.0, 1.0)
+                      * 255).astype(np.uint8)
+    freq_matrix = _dequantize_freqs(freq_q, valid)
+    log_table = build_hwe_log_table(freq_matrix)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez(cache_path, pops=np.array(major_populations),
+             variant_ids=np.array(variant_ids),
+             freq_q=freq_q, valid=valid, log_table=log_table)
+
+    return major_populations, variant_ids, freq_matrix, log_table
+
+
+def _genotype_vector(sample_genotypes, variant_index):
+    """
+    Resolves a sample against the panel once, returning (cols, genotypes)
+    arrays over the intersection of the sample's variants and the reference
+    index. One dict walk with a single .get per variant; downstream code
+    indexes the frequency matrix and log tables directly, with no membership
+    tests anywhere in the scoring loops.
+    """
+    cols = np.empty(len(sample_genotypes), dtype=np.int64)
+    genotypes = np.empty(len(sample_genotypes), dtype=np.int8)
+    n = 0
+    for variant, genotype in sample_genotypes.items():
+        idx = variant_index.get(variant)
+        if idx is not None:
+            cols[n] = idx
+            genotypes[n] = genotype
+            n += 1
+    return cols[:n], genotypes[:n]
+
+
+def _calculate_admixture_py(sample_genotypes, major_populations, variant_index,
+                            log_table):
+    """
+    Stdlib-only scorer over the nested-list log table from
+    _load_reference_panel_py. The intersection with the panel is resolved once
+    and the inner loop is a tuple index plus an addition per variant -- no
+    pow or log calls on the interpreted path either.
+    """
+    resolved = [(variant_index[v], g) for v, g in sample_genotypes.items()
+                if v in variant_index]
+
+    log_likelihoods = []
+    for pop_table in log_table:
+        total = 0.0
+        observed = False
+        for idx, genotype in resolved:
+            entry = pop_table[idx]
+            if entry is None:
+                continue
+            total += entry[genotype]
+            observed = True
+        # No evidence for this population: rule it out, as in the numpy path
+        log_likelihoods.append(total if observed else float('-inf'))
+
+    max_log_like = max(log_likelihoods, default=float('-inf'))
+    if max_log_like == float('-inf'):
+        return {pop: 0.0 for pop in major_populations}
+
+    likelihoods = [math.exp(ll - max_log_like) for ll in log_likelihoods]
+    total_likelihood = sum(likelihoods)
+
+    return {pop: like / total_likelihood
+            for pop, like in zip(major_populations, likelihoods)}
+
+
+def calculate_admixture(sample_genotypes, major_populations, variant_index,
+                        freq_matrix, log_table):
+    """
+    Calculates admixture proportions using a log-likelihood approach.
+
+    With numba installed, the log-likelihoods come from the JIT-compiled kernel
+    in ancestry_numba (populations in parallel, no GIL). Otherwise scoring is a
+    pure gather over the precomputed HWE log-probability table from
+    build_hwe_log_table -- no pow/log work in either hot path.
+    """
+    epsilon = 1e-9  # A small number to avoid log(0)
+
+    if np is None:
+        return _calculate_admixture_py(sample_genotypes, major_populations,
+                                       variant_index, log_table)
+
+    # Resolve the sample's variants to table columns through the integer index,
+    # once for all populations -- O(sample size), not O(panel size)
+    cols, genotypes = _genotype_vector(sample_genotypes, variant_index)
+
+    if _admix_ll is not None and len(cols) > 0:
+        sub = np.ascontiguousarray(freq_matrix[:, cols])
+        log_likelihoods = _admix_ll(sub, np.isfinite(sub), genotypes, epsilon)
+
+        # A population with no usable frequency at any of the sample's variants
+        # carries no evidence: mark it -inf so its empty sum doesn't masquerade
+        # as a perfect log-likelihood of 0.
+        observed = np.isfinite(sub).any(axis=1)
+        log_likelihoods = np.where(observed, log_likelihoods, -np.inf)
+
+        # Normalize with log-sum-exp: subtracting the max finite log-likelihood
+        # before exponentiating avoids underflow even at hundreds of thousands
+        # of variants; -inf rows exponentiate to an exact 0 proportion.
+        finite = np.isfinite(log_likelihoods)
+        if not finite.any():
+            return {pop: 0.0 for pop in major_populations}
+
+        likelihoods = np.exp(log_likelihoods - log_likelihoods[finite].max())
+        likelihoods[~finite] = 0.0
+        proportions = likelihoods / likelihoods.sum()
+    else:
+        # Without numba, score as a one-row batch (see calculate_admixture_batch)
+        genotype_row = np.full((1, freq_matrix.shape[1]), -1, dtype=np.int8)
+        genotype_row[0, cols] = genotypes
+        proportions = calculate_admixture_batch(genotype_row, freq_matrix, log_table)[0]
+
+    return dict(zip(major_populations, proportions.tolist()))
+
+
+def calculate_admixture_batch(genotype_matrix, freq_matrix, log_table):
+    """
+    Scores a whole cohort of samples in a few BLAS matmuls.
+
+    genotype_matrix is a (sample x variant) int8 array aligned to the panel's
+    variant order, with -1 marking variants a sample doesn't cover. Boolean
+    masks per genotype turn the scoring into three gemms against the HWE log
+    tables, so N samples x P populations x V variants run at peak matmul
+    throughput instead of N sequential scoring passes. Returns a (sample x
+    population) array of proportions; rows follow the same no-evidence and
+    log-sum-exp handling as calculate_admixture.
+    """
+    if _admix_ll_batch is not None:
+        # JIT kernel: samples run in parallel via prange against the shared
+        # panel, skipping uncovered variants and missing panel entries inline
+        panel = np.ascontiguousarray(freq_matrix)
+        log_likelihoods = _admix_ll_batch(
+            panel, np.isfinite(panel),
+            np.ascontiguousarray(genotype_matrix, dtype=np.int8), 1e-9)
+    else:
+        # NaN table entries mark missing panel data; adding 0 there reproduces
+        # the single-sample path's nansum skip
+        tables = np.nan_to_num(log_table, nan=0.0)
+
+        log_likelihoods = ((genotype_matrix == 0).astype(np.float32) @ tables[0].T
+                           + (genotype_matrix == 1).astype(np.float32) @ tables[1].T
+                           + (genotype_matrix == 2).astype(np.float32) @ tables[2].T)
+
+    # Evidence mask: does each sample cover any variant with a usable
+    # frequency for each population?
+    covered = (genotype_matrix >= 0).astype(np.float32)
+    observed = (covered @ np.isfinite(freq_matrix).T.astype(np.float32)) > 0
+    log_likelihoods = np.where(observed, log_likelihoods, -np.inf)
+
+    proportions = np.zeros(log_likelihoods.shape)
+    finite_rows = np.isfinite(log_likelihoods).any(axis=1)
+    if finite_rows.any():
+        shifted = log_likelihoods[finite_rows]
+        shifted = shifted - shifted.max(axis=1, keepdims=True)
+        likelihoods = np.exp(shifted)  # -inf entries become exact 0s
+        proportions[finite_rows] = likelihoods / likelihoods.sum(axis=1, keepdims=True)
 
     return proportions
 
@@ -228,32 +591,33 @@ def display_results(proportions):
     """
     # ANSI escape codes for background colors
     colors = [41, 42, 43, 44, 45, 46, 47, 101, 102, 104]
-    reset_color = "\\033[0m"
+    reset_color = "\033[0m"
     bar_width = 100 # Total characters for the bar
 
-    print("\\n## Ancestry Composition Estimate ##\\n")
+    print("\n## Ancestry Composition Estimate ##\n")
 
     # Sort proportions for consistent ordering
     sorted_proportions = sorted(proportions.items(), key=lambda item: item[1], reverse=True)
 
-    # 1. Draw the stacked bar
-    sys.stdout.write("Total Composition: [")
+    # 1. Draw the stacked bar: assemble the whole line in memory and emit it
+    # with a single write instead of one syscall-prone write per segment
+    nonzero = [(pop, perc) for pop, perc in sorted_proportions if perc > 0]
+    parts = ["Total Composition: ["]
     cumulative_width = 0
-    for i, (pop, perc) in enumerate(sorted_proportions):
-        if perc == 0: continue
+    for i, (pop, perc) in enumerate(nonzero):
         color_code = colors[i % len(colors)]
 
-        # Calculate number of blocks for this segment
-        segment_width = round(perc * bar_width)
-
-        # Adjust last segment to fill the bar exactly to bar_width
-        if i == len([p for p in sorted_proportions if p[1] > 0]) - 1:
+        # Last segment fills the bar exactly to bar_width
+        if i == len(nonzero) - 1:
             segment_width = bar_width - cumulative_width
+        else:
+            segment_width = round(perc * bar_width)
 
-        sys.stdout.write(f"\\033[{color_code}m{' ' * segment_width}")
+        parts.append(f"\033[{color_code}m{' ' * segment_width}")
         cumulative_width += segment_width
 
-    sys.stdout.write(f"{reset_color}]\\n\\n")
+    parts.append(f"{reset_color}]\n\n")
+    sys.stdout.write(''.join(parts))
     sys.stdout.flush()
 
     # 2. Draw the legend
@@ -264,7 +628,7 @@ def display_results(proportions):
         percentage_str = f"{perc*100:.2f}%"
         # Use a block character (U+2588) or a simple space for the color key
         block = "█"
-        print(f"  \\033[{color_code}m{block}{reset_color} {pop:<22} {percentage_str:>8}")
+        print(f"  \033[{color_code}m{block}{reset_color} {pop:<22} {percentage_str:>8}")
 
 # --- MAIN EXECUTION ---
 
@@ -272,23 +636,27 @@ if __name__ == "__main__":
     print("Starting admixture analysis...")
 
     # 1. Parse input data
-    # In a real script, you'd use:
-    # with open('sample.vcf', 'r') as f: vcf_content = f.read()
-    # with open('reference.tsv', 'r') as f: tsv_content = f.read()
+    # With real files, prefer the memory-mapped readers -- they never load
+    # the whole file into a Python string:
+    # sample_genotypes = parse_vcf_file('sample.vcf')
+    # panel = load_reference_panel_file('reference.tsv', POPULATION_MAP)
     sample_genotypes = parse_vcf(sample_vcf_data)
-    reference_frequencies = parse_reference(reference_tsv_data)
 
-    print(f"Parsed {len(sample_genotypes)} variants for the sample.")
-    print(f"Parsed {len(reference_frequencies)} variants from the reference panel.")
+    # 2. Load the aggregated reference panel and its genotype log-probability
+    # table (parsed and precomputed once, then served from the .npz cache)
+    major_populations, variant_ids, freq_matrix, log_table = load_reference_panel(
+        reference_tsv_data, POPULATION_MAP)
+    variant_index = {v: i for i, v in enumerate(variant_ids)}
 
-    # 2. Aggregate reference frequencies into major population groups
-    major_pop_frequencies = aggregate_frequencies(reference_frequencies, POPULATION_MAP)
+    print(f"Parsed {len(sample_genotypes)} variants for the sample.")
+    print(f"Parsed {len(variant_ids)} variants from the reference panel.")
 
     # 3. Calculate admixture
-    admixture_proportions = calculate_admixture(sample_genotypes, major_pop_frequencies)
+    admixture_proportions = calculate_admixture(
+        sample_genotypes, major_populations, variant_index, freq_matrix, log_table)
 
     # 4. Display the results
     if not any(admixture_proportions.values()):
-        print("\\nError: Could not calculate admixture. Check if variants in VCF match the reference.")
+        print("\nError: Could not calculate admixture. Check if variants in VCF match the reference.")
     else:
         display_results(admixture_proportions)
\ No newline at end of file
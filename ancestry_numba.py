@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Numba-accelerated kernels for the admixture analysis.
+
+Importing this module requires numba. ancestry_analysis_01 treats it as an
+optional fast path and falls back to the plain NumPy implementation when
+numba is not installed. cache=True persists the compiled machine code on
+disk so only the very first run pays the JIT compile cost.
+"""
+
+import math
+
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True)
+def _scan_vcf(buf, id_starts, id_ends, genotypes):
+    """
+    Single-pass VCF scanner over a raw uint8 buffer.
+
+    Walks the buffer once, skipping header lines, and for each data line
+    records the byte offsets of the ID field (column 3) and the decoded
+    genotype of the first sample's GT field (column 10) into the preallocated
+    output arrays. Returns the number of rows written. Lines whose GT is not
+    a diploid 0/1 combination are dropped, matching parse_vcf.
+    """
+    n = buf.shape[0]
+    i = 0
+    row = 0
+    while i < n:
+        if buf[i] == 35:  # '#' header line: skip to newline
+            while i < n and buf[i] != 10:
+                i += 1
+            i += 1
+            continue
+        field = 0
+        id_start = -1
+        id_end = -1
+        gt = -1
+        while i < n and buf[i] != 10:
+            if field == 2 and id_start < 0:
+                id_start = i
+            if buf[i] == 9:  # tab
+                if field == 2:
+                    id_end = i
+                field += 1
+                if field == 9 and i + 3 < n:
+                    # GT is the first three bytes after the tab -- [01][/|][01]
+                    # followed by a field boundary (tab, colon, newline or end
+                    # of buffer), so multi-digit allele indices like 0/11 at
+                    # multi-allelic sites are rejected, matching parse_vcf
+                    a = buf[i + 1]
+                    sep = buf[i + 2]
+                    b = buf[i + 3]
+                    if ((a == 48 or a == 49) and (sep == 47 or sep == 124)
+                            and (b == 48 or b == 49)
+                            and (i + 4 >= n or buf[i + 4] == 9
+                                 or buf[i + 4] == 10 or buf[i + 4] == 58)):
+                        gt = (a - 48) + (b - 48)
+            i += 1
+        if id_start >= 0 and id_end > id_start and gt >= 0:
+            id_starts[row] = id_start
+            id_ends[row] = id_end
+            genotypes[row] = gt
+            row += 1
+        i += 1  # step over the newline
+    return row
+
+
+# The reference panel's layout is effectively fixed in production, so the
+# kernel is compiled against an explicit signature: float32 C-contiguous
+# panel, int8 genotypes, float64 output. LLVM then sees exact types and
+# alignment up front (no lazy type inference), and boundscheck=False plus
+# error_model='numpy' strip the remaining guards from the inner loop.
+_ADMIX_LL_SIG = 'f8[:](f4[:,::1], b1[:,::1], i1[::1], f8)'
+
+
+def _admix_ll_impl(freq_matrix, valid, genotypes, epsilon):
+    """
+    Per-population Hardy-Weinberg log-likelihoods for a single sample.
+
+    freq_matrix is a (population x variant) float32 array, genotypes an int8
+    vector aligned to the same variant order, and valid a boolean mask that is
+    False where a population has no frequency for a variant (those entries are
+    skipped, matching the NumPy path's nansum). Populations run concurrently
+    via prange; LLVM lowers the inner HWE-plus-log loop to tight native code.
+    """
+    num_pops, num_variants = freq_matrix.shape
+    out = np.empty(num_pops)
+    for i in prange(num_pops):
+        total = 0.0
+        for j in range(num_variants):
+            if not valid[i, j]:
+                continue
+            p = min(max(freq_matrix[i, j], epsilon), 1.0 - epsilon)
+            q = 1.0 - p
+            # Branchless HWE: decode the genotype into 0/1 weights (g&1 is 1
+            # only for hets, g>>1 only for hom-alt) and blend the three
+            # probabilities, instead of a data-dependent three-way branch the
+            # CPU can't predict and LLVM can't vectorize across.
+            g = genotypes[j]
+            het = g & 1
+            alt = g >> 1
+            prob = ((1 - het - alt) * (q * q)
+                    + het * (2.0 * p * q)
+                    + alt * (p * p))
+            total += math.log(prob)
+        out[i] = total
+    return out
+
+
+_ADMIX_LL_BATCH_SIG = 'f8[:,:](f4[:,::1], b1[:,::1], i1[:,::1], f8)'
+
+
+def _admix_ll_batch_impl(freq_matrix, valid, genotype_matrix, epsilon):
+    """
+    Log-likelihoods for a whole cohort: genotype_matrix is (sample x variant)
+    int8 with -1 marking uncovered variants. Sample scoring is embarrassingly
+    parallel -- every row reads the same shared panel -- so prange runs over
+    samples for near-linear scaling up to core count, GIL-free. Returns a
+    (sample x population) float64 array.
+    """
+    num_samples = genotype_matrix.shape[0]
+    num_pops, num_variants = freq_matrix.shape
+    out = np.empty((num_samples, num_pops))
+    for n in prange(num_samples):
+        for i in range(num_pops):
+            total = 0.0
+            for j in range(num_variants):
+                g = genotype_matrix[n, j]
+                if g < 0 or not valid[i, j]:
+                    continue
+                p = min(max(freq_matrix[i, j], epsilon), 1.0 - epsilon)
+                q = 1.0 - p
+                het = g & 1
+                alt = g >> 1
+                prob = ((1 - het - alt) * (q * q)
+                        + het * (2.0 * p * q)
+                        + alt * (p * p))
+                total += math.log(prob)
+            out[n, i] = total
+    return out
+
+
+# Prefer the ahead-of-time compiled extension (built by running this module
+# directly) -- it loads with zero JIT warmup; otherwise JIT with the explicit
+# signatures so compilation happens once at import rather than first call.
+try:
+    from admix_ext import admix_ll as _admix_ll
+    from admix_ext import admix_ll_batch as _admix_ll_batch
+except ImportError:
+    _admix_ll = njit(_ADMIX_LL_SIG, parallel=True, fastmath=True, cache=True,
+                     boundscheck=False, error_model='numpy')(_admix_ll_impl)
+    _admix_ll_batch = njit(_ADMIX_LL_BATCH_SIG, parallel=True, fastmath=True,
+                           cache=True, boundscheck=False,
+                           error_model='numpy')(_admix_ll_batch_impl)
+
+
+if __name__ == '__main__':
+    # Build the AOT extension: `python ancestry_numba.py` produces admix_ext.so
+    # next to this file. prange degrades to range under AOT (pycc has no
+    # parallel target), so the JIT build stays preferable on many-core hosts.
+    from numba.pycc import CC
+
+    cc = CC('admix_ext')
+    cc.export('admix_ll', _ADMIX_LL_SIG)(_admix_ll_impl)
+    cc.export('admix_ll_batch', _ADMIX_LL_BATCH_SIG)(_admix_ll_batch_impl)
+    cc.compile()